@@ -46,6 +46,7 @@ def create_app():
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["ETag", "X-SISEP-Delta"],
     )
 
     # Incluir rotas
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class BusResult(BaseModel):
     bus_id: int
@@ -46,6 +46,38 @@ class ExtGridResult(BaseModel):
     q_mvar: float
     vm_pu: float
 
+class AlgorithmAttempt(BaseModel):
+    algorithm: str
+    converged: bool
+    iterations: Optional[int] = 0
+    execution_time_s: Optional[float] = 0.0
+    error: Optional[str] = None
+
+class ProfileFunction(BaseModel):
+    name: str
+    file: str
+    line: int
+    self_samples: int
+    total_samples: int
+    self_percent: float
+
+class ProfileSummary(BaseModel):
+    profile_id: str                          # Identificador do artefato (GET /sisep/profiles/{profile_id})
+    duration_s: float
+    samples: int
+    phases: Dict[str, float]                 # Duração de cada fase (parse, solve, conversion) em segundos
+    top_functions: List[ProfileFunction]
+
+class BusPosition(BaseModel):
+    bus_id: int
+    x: float  # Coordenadas normalizadas em [0, 1]
+    y: float
+
+class NetworkLayout(BaseModel):
+    topology_hash: str                       # Hash da topologia usado como chave de cache
+    method: str                              # Método de layout (force, hierarchical)
+    buses: List[BusPosition]
+
 class PowerSystemResult(BaseModel):
     buses: List[BusResult]
     lines: List[LineResult]
@@ -60,3 +92,35 @@ class PowerSystemResult(BaseModel):
     iterations: Optional[int] = 0            # Número de iterações do algoritmo
     execution_time_s: Optional[float] = 0.0  # Tempo de execução em segundos
     algorithm: Optional[str] = 'nr'          # Algoritmo utilizado (nr, fdxb, fdbx, bfsw, gs, dc)
+    attempts: Optional[List[AlgorithmAttempt]] = []  # Tentativas da cadeia de fallback (algorithm=auto)
+    profile: Optional[ProfileSummary] = None  # Resumo do perfil de execução (apenas com profile=true)
+    layout: Optional[NetworkLayout] = None    # Posição das barras (apenas com include_layout=true)
+
+class IndexedLineResult(LineResult):
+    index: int  # Posição do elemento em PowerSystemResult.lines
+
+class IndexedLoadResult(LoadResult):
+    index: int  # Posição do elemento em PowerSystemResult.loads
+
+class IndexedGeneratorResult(GeneratorResult):
+    index: int  # Posição do elemento em PowerSystemResult.generators
+
+class PowerSystemResultDelta(BaseModel):
+    base_etag: str                           # ETag do resultado que o cliente já possui
+    etag: str                                # ETag do resultado após aplicar esta diferença
+    tolerance: float                         # Variação mínima considerada como alteração
+    changed: bool                            # Indica se algum valor mudou além da tolerância
+    buses: List[BusResult] = []              # Apenas barras alteradas (identificadas por bus_id)
+    lines: List[IndexedLineResult] = []      # Apenas linhas/transformadores alterados
+    loads: List[IndexedLoadResult] = []
+    generators: List[IndexedGeneratorResult] = []
+    ext_grid: Optional[ExtGridResult] = None  # Presente apenas se alterado
+    layout: Optional[NetworkLayout] = None    # Presente apenas se alterado (mesma topologia)
+    genCapacityP: Optional[float] = 0.0
+    genCapacityQmin: Optional[float] = 0.0
+    genCapacityQmax: Optional[float] = 0.0
+    loadSystemP: Optional[float] = 0.0
+    loadSystemQ: Optional[float] = 0.0
+    iterations: Optional[int] = 0
+    execution_time_s: Optional[float] = 0.0
+    algorithm: Optional[str] = 'nr'
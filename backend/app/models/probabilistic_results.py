@@ -0,0 +1,52 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+
+class InjectionDistribution(BaseModel):
+    distribution: str = 'normal'  # Distribuição do fator multiplicativo (normal, uniform)
+    mean: float = 1.0             # Valor médio do fator aplicado sobre o caso base
+    std: float = 0.1              # Desvio padrão (normal) ou meia largura do intervalo (uniform)
+
+class ProbabilisticPowerFlowRequest(BaseModel):
+    samples: int = Field(1000, ge=1, le=100000)            # Número de amostras de Monte Carlo
+    load: InjectionDistribution = InjectionDistribution()  # Perturbação das cargas (P e Q com fator de potência constante)
+    generation: InjectionDistribution = InjectionDistribution(std=0.0)  # Perturbação da potência ativa dos geradores
+    algorithm: str = 'nr'                                  # Algoritmo de fluxo de potência (nr, fdxb, fdbx, bfsw, gs)
+    batch_size: int = Field(250, ge=1)                     # Amostras resolvidas por lote
+    workers: int = Field(0, ge=0)                          # Processos paralelos (0 = automático)
+    seed: Optional[int] = None                             # Semente do gerador aleatório
+    percentiles: List[float] = [5.0, 50.0, 95.0]           # Percentis calculados para Vm e perdas
+    loading_threshold: float = 100.0                       # Limite de carregamento (%) para probabilidade de excedência
+
+class BusVoltageStatistics(BaseModel):
+    bus_id: int
+    vm_mean_pu: float
+    vm_std_pu: float
+    vm_min_pu: float
+    vm_max_pu: float
+    vm_percentiles_pu: Dict[str, float]  # Chaves no formato p5, p50, p95
+
+class LineLoadingStatistics(BaseModel):
+    from_bus: int
+    to_bus: int
+    loading_mean_percent: float
+    loading_max_percent: float
+    exceedance_probability: float  # Fração das amostras com carregamento acima do limite
+
+class LossStatistics(BaseModel):
+    mean_mw: float
+    std_mw: float
+    min_mw: float
+    max_mw: float
+    percentiles_mw: Dict[str, float]
+
+class ProbabilisticPowerFlowResult(BaseModel):
+    samples: int
+    converged_samples: int
+    convergence_rate: float
+    buses: List[BusVoltageStatistics]
+    lines: List[LineLoadingStatistics]
+    losses: LossStatistics
+    algorithm: Optional[str] = 'nr'
+    batches: Optional[int] = 0
+    workers: Optional[int] = 1
+    execution_time_s: Optional[float] = 0.0
@@ -1,10 +1,80 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Path, Query
-from typing import List
-from app.models.power_system_results import PowerSystemResult
+from fastapi import APIRouter, HTTPException, UploadFile, File, Path, Query, Body, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from typing import List, Optional
+from app.models.power_system_results import PowerSystemResult, NetworkLayout
+from app.models.probabilistic_results import ProbabilisticPowerFlowRequest, ProbabilisticPowerFlowResult
 from app.services.matpower_service import MatpowerService
+from app.services.probabilistic_service import ProbabilisticService
+from app.services.profiling_service import ProfilingService, RequestProfiler
+from app.services.result_delta_service import ResultDeltaService
+from app.services.layout_service import LayoutService
 
 router = APIRouter()
 matpower_service = MatpowerService()
+probabilistic_service = ProbabilisticService(matpower_service)
+profiling_service = ProfilingService()
+result_delta_service = ResultDeltaService()
+layout_service = LayoutService()
+
+def _create_profiler(profile: bool, profile_header: Optional[str]) -> Optional[RequestProfiler]:
+    """Cria o profiler quando solicitado via query (profile=true) ou header (X-SISEP-Profile)"""
+    requested = profile or (profile_header or '').lower() in ('1', 'true', 'yes')
+    if not requested:
+        return None
+    try:
+        return profiling_service.create_profiler()
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+def _run_profiled(profiler: Optional[RequestProfiler], name: str, simulate, *args) -> PowerSystemResult:
+    """Executa a simulação, sob o profiler quando houver, e anexa o resumo do perfil"""
+    if profiler is None:
+        return simulate(*args)
+    with profiler:
+        result = simulate(*args, profiler=profiler)
+    result.profile = profiling_service.save(profiler, name)
+    return result
+
+def _conditional_response(result: PowerSystemResult, response: Response, if_none_match: Optional[str], delta: bool, tolerance: float):
+    """
+    Aplica o ETag ao resultado e trata If-None-Match.
+    
+    Retorna 304 quando nenhum valor mudou além da tolerância em relação ao resultado
+    que o cliente possui, apenas os elementos alterados quando delta=true, ou o
+    resultado completo quando o ETag do cliente é desconhecido ou a rede mudou.
+    """
+    tag = result_delta_service.etag(result)
+    base_tags = result_delta_service.parse_if_none_match(if_none_match)
+
+    # Resultados com perfil são sempre retornados por completo
+    if result.profile is None:
+        if tag in base_tags:
+            return Response(status_code=304, headers={"ETag": f'"{tag}"'})
+
+        for base_tag in base_tags:
+            base = result_delta_service.get(base_tag)
+            if base is None:
+                continue
+            diff = result_delta_service.diff(base, result, tolerance)
+            if diff is None:
+                # Estrutura da rede mudou: enviar o resultado completo
+                break
+            result_delta, merged = diff
+            if not result_delta.changed:
+                return Response(status_code=304, headers={"ETag": f'"{base_tag}"'})
+            if delta:
+                result_delta_service.store(merged)
+                return JSONResponse(
+                    content=jsonable_encoder(result_delta),
+                    headers={"ETag": f'"{result_delta.etag}"', "X-SISEP-Delta": "true"}
+                )
+            break
+
+    result_delta_service.store(result)
+    response.headers["ETag"] = f'"{tag}"'
+    return result
 
 @router.get("/matpower/files", response_model=List[str])
 async def list_matpower_files():
@@ -25,6 +95,7 @@ async def list_matpower_files():
 
 @router.get("/matpower/{filename}", response_model=PowerSystemResult)
 async def simulate_matpower_filename(
+    response: Response,
     filename: str = Path(
         ..., 
         description="Nome do arquivo MATPOWER (ex: case4gs.m, case5.m, case6ww.m, case9.m, case14.m)",
@@ -32,8 +103,38 @@ async def simulate_matpower_filename(
     ),
     algorithm: str = Query(
         "nr",
-        description="Algoritmo de fluxo de potência (nr, fdxb, fdbx, bfsw, gs, dc)",
+        description="Algoritmo de fluxo de potência (nr, fdxb, fdbx, bfsw, gs, dc ou auto)",
         examples={"default": {"value": "nr"}}
+    ),
+    profile: bool = Query(
+        False,
+        description="Executa a requisição sob o profiler (requer SISEP_PROFILING_ENABLED=true)"
+    ),
+    x_sisep_profile: Optional[str] = Header(
+        None,
+        description="Alternativa ao parâmetro profile (X-SISEP-Profile: true)"
+    ),
+    delta: bool = Query(
+        False,
+        description="Com If-None-Match, retorna apenas os elementos alterados em relação ao resultado anterior"
+    ),
+    tolerance: float = Query(
+        1e-6,
+        ge=0,
+        le=ResultDeltaService.MAX_TOLERANCE,
+        description="Variação mínima para considerar um valor alterado (If-None-Match/delta)"
+    ),
+    if_none_match: Optional[str] = Header(
+        None,
+        description="ETag de um resultado anterior"
+    ),
+    include_layout: bool = Query(
+        False,
+        description="Inclui no resultado a posição das barras calculada no servidor"
+    ),
+    layout_method: str = Query(
+        "force",
+        description="Método de layout (force, hierarchical)"
     )
 ):
     """
@@ -41,13 +142,57 @@ async def simulate_matpower_filename(
     
     Args:
         filename (str): Nome do arquivo MATPOWER a ser simulado
-        algorithm (str): Algoritmo a ser utilizado (padrão: nr - Newton-Raphson)
+        algorithm (str): Algoritmo a ser utilizado (padrão: nr - Newton-Raphson; auto seleciona pela rede)
+        profile (bool): Gera um perfil de execução (parse, solve e conversão)
+        delta (bool): Retorna apenas os elementos alterados em relação ao ETag enviado em If-None-Match
+        tolerance (float): Variação mínima para considerar um valor alterado
+        include_layout (bool): Inclui o layout da rede (cacheado por topologia)
+        layout_method (str): Método de layout (force, hierarchical)
         
     Returns:
         PowerSystemResult: Resultados da simulação do fluxo de potência
+        (ou PowerSystemResultDelta com delta=true, ou 304 se nada mudou)
     """
+    profiler = _create_profiler(profile, x_sisep_profile)
     try:
-        return matpower_service.simulate_from_filename(filename, algorithm)
+        result = _run_profiled(profiler, f"matpower/{filename}", matpower_service.simulate_from_filename, filename, algorithm)
+        if include_layout:
+            # Cálculo do layout é intensivo em CPU: fora do event loop
+            result.layout = await run_in_threadpool(layout_service.layout_from_result, result, layout_method)
+        return _conditional_response(result, response, if_none_match, delta, tolerance)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/matpower/{filename}/layout", response_model=NetworkLayout)
+async def get_matpower_layout(
+    filename: str = Path(
+        ...,
+        description="Nome do arquivo MATPOWER (ex: case9p.m, case14p.m)",
+        examples={"default": {"value": "case14p.m"}}
+    ),
+    method: str = Query(
+        "force",
+        description="Método de layout (force, hierarchical)",
+        examples={"default": {"value": "force"}}
+    )
+):
+    """
+    Calcula a posição das barras de um arquivo MATPOWER pré carregado.
+    
+    O layout é calculado uma vez por topologia (lista de ramos) e mantido em cache.
+    
+    Args:
+        filename (str): Nome do arquivo MATPOWER
+        method (str): force (Fruchterman-Reingold) ou hierarchical (camadas a partir da barra slack)
+        
+    Returns:
+        NetworkLayout: Coordenadas normalizadas em [0, 1] por barra
+    """
+    try:
+        net = await run_in_threadpool(matpower_service.load_net_from_filename, filename)
+        return await run_in_threadpool(layout_service.layout_from_net, net, method)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -55,11 +200,42 @@ async def simulate_matpower_filename(
 
 @router.post("/simulate/matpower/upload", response_model=PowerSystemResult)
 async def simulate_matpower_upload(
+    response: Response,
     file: UploadFile = File(..., description="Arquivo MATPOWER (.m)"),
     algorithm: str = Query(
         "nr",
-        description="Algoritmo de fluxo de potência (nr, fdxb, fdbx, bfsw, gs, dc)",
+        description="Algoritmo de fluxo de potência (nr, fdxb, fdbx, bfsw, gs, dc ou auto)",
         examples={"default": {"value": "nr"}}
+    ),
+    profile: bool = Query(
+        False,
+        description="Executa a requisição sob o profiler (requer SISEP_PROFILING_ENABLED=true)"
+    ),
+    x_sisep_profile: Optional[str] = Header(
+        None,
+        description="Alternativa ao parâmetro profile (X-SISEP-Profile: true)"
+    ),
+    delta: bool = Query(
+        False,
+        description="Com If-None-Match, retorna apenas os elementos alterados em relação ao resultado anterior"
+    ),
+    tolerance: float = Query(
+        1e-6,
+        ge=0,
+        le=ResultDeltaService.MAX_TOLERANCE,
+        description="Variação mínima para considerar um valor alterado (If-None-Match/delta)"
+    ),
+    if_none_match: Optional[str] = Header(
+        None,
+        description="ETag de um resultado anterior"
+    ),
+    include_layout: bool = Query(
+        False,
+        description="Inclui no resultado a posição das barras calculada no servidor"
+    ),
+    layout_method: str = Query(
+        "force",
+        description="Método de layout (force, hierarchical)"
     )
 ):
     """
@@ -67,15 +243,89 @@ async def simulate_matpower_upload(
     
     Args:
         file (UploadFile): Arquivo MATPOWER a ser simulado
-        algorithm (str): Algoritmo a ser utilizado (padrão: nr - Newton-Raphson)
+        algorithm (str): Algoritmo a ser utilizado (padrão: nr - Newton-Raphson; auto seleciona pela rede)
+        profile (bool): Gera um perfil de execução (parse, solve e conversão)
+        delta (bool): Retorna apenas os elementos alterados em relação ao ETag enviado em If-None-Match
+        tolerance (float): Variação mínima para considerar um valor alterado
+        include_layout (bool): Inclui o layout da rede (cacheado por topologia)
+        layout_method (str): Método de layout (force, hierarchical)
         
     Returns:
         PowerSystemResult: Resultados da simulação do fluxo de potência
+        (ou PowerSystemResultDelta com delta=true, ou 304 se nada mudou)
     """
+    profiler = _create_profiler(profile, x_sisep_profile)
     try:
         content = await file.read()
-        return matpower_service.simulate_from_string(content.decode(), algorithm)
+        result = _run_profiled(profiler, f"upload/{file.filename}", matpower_service.simulate_from_string, content.decode(), algorithm)
+        if include_layout:
+            # Cálculo do layout é intensivo em CPU: fora do event loop
+            result.layout = await run_in_threadpool(layout_service.layout_from_result, result, layout_method)
+        return _conditional_response(result, response, if_none_match, delta, tolerance)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/matpower/{filename}/probabilistic", response_model=ProbabilisticPowerFlowResult)
+async def simulate_matpower_probabilistic(
+    filename: str = Path(
+        ...,
+        description="Nome do arquivo MATPOWER (ex: case9p.m, case14p.m)",
+        examples={"default": {"value": "case9p.m"}}
+    ),
+    request: ProbabilisticPowerFlowRequest = Body(
+        ...,
+        description="Distribuições das injeções de carga/geração e parâmetros de amostragem"
+    )
+):
+    """
+    Executa um fluxo de potência probabilístico (Monte Carlo) a partir de um arquivo MATPOWER pré carregado.
+    
+    As amostras são resolvidas em lotes que reaproveitam a estrutura da rede e podem
+    ser distribuídos entre processos. Retorna apenas estatísticas agregadas.
+    
+    Args:
+        filename (str): Nome do arquivo MATPOWER a ser simulado
+        request (ProbabilisticPowerFlowRequest): Distribuições e número de amostras
+        
+    Returns:
+        ProbabilisticPowerFlowResult: Percentis de tensão por barra, probabilidade de sobrecarga e distribuição de perdas
+    """
+    try:
+        return await run_in_threadpool(probabilistic_service.simulate_from_filename, filename, request)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str = Path(..., description="Identificador retornado em PowerSystemResult.profile.profile_id"),
+    fmt: str = Query(
+        "speedscope",
+        alias="format",
+        description="Formato do artefato (speedscope ou collapsed)"
+    )
+):
+    """
+    Retorna o artefato de um perfil gerado com profile=true.
+    
+    Args:
+        profile_id (str): Identificador do perfil
+        fmt (str): speedscope (JSON para https://www.speedscope.app) ou collapsed (pilhas colapsadas)
+        
+    Returns:
+        Response: Conteúdo do artefato
+    """
+    if not profiling_service.PROFILING_ENABLED:
+        raise HTTPException(status_code=403, detail="Perfilamento desabilitado")
+    try:
+        content = profiling_service.load(profile_id, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    media_type = "application/json" if fmt == "speedscope" else "text/plain"
+    return Response(content=content, media_type=media_type)
@@ -0,0 +1,199 @@
+import pandapower as pp
+import numpy as np
+import hashlib
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+from app.models.power_system_results import AlgorithmAttempt
+
+class AlgorithmSelector:
+    """Seleção automática do algoritmo de fluxo de potência (algorithm=auto)"""
+
+    # Limite de iterações de cada algoritmo dentro da cadeia de fallback
+    ITERATION_BUDGET = {
+        'nr': 20,
+        'fdxb': 40,
+        'fdbx': 40,
+        'bfsw': 50,
+        'gs': 1000,
+    }
+
+    # Acima desta relação R/X os métodos desacoplados perdem eficiência
+    HIGH_RX_RATIO = 0.5
+
+    # A partir deste tamanho os métodos desacoplados compensam frente ao NR
+    LARGE_NETWORK_BUSES = 300
+
+    # Peso da média móvel exponencial dos tempos de execução
+    HISTORY_SMOOTHING = 0.3
+
+    # Taxa mínima de convergência para um algoritmo medido manter sua posição na cadeia
+    MIN_SUCCESS_RATIO = 0.5
+
+    # Quantidade de casos mantidos no histórico
+    MAX_ENTRIES = 256
+
+    def __init__(self):
+        # Histórico por caso: {case_key: {algoritmo: {'runs', 'failures', 'mean_time_s'}}}
+        self._history: "OrderedDict[str, Dict[str, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def case_key(self, net: pp.pandapowerNet) -> str:
+        """Identificador do caso a partir da topologia e dos parâmetros dos ramos"""
+        digest = hashlib.sha1()
+        digest.update(str(len(net.bus)).encode())
+        if len(net.line) > 0:
+            digest.update(net.line[['from_bus', 'to_bus', 'r_ohm_per_km', 'x_ohm_per_km']].to_numpy(dtype=float).tobytes())
+        if len(net.trafo) > 0:
+            digest.update(net.trafo[['hv_bus', 'lv_bus', 'vk_percent', 'vkr_percent']].to_numpy(dtype=float).tobytes())
+        return digest.hexdigest()
+
+    def network_features(self, net: pp.pandapowerNet) -> dict:
+        """Extrai as características da rede usadas na escolha do algoritmo"""
+        lines = net.line[net.line.in_service]
+        trafos = net.trafo[net.trafo.in_service]
+
+        from_buses = np.concatenate((lines.from_bus.values, trafos.hv_bus.values)).astype(int)
+        to_buses = np.concatenate((lines.to_bus.values, trafos.lv_bus.values)).astype(int)
+
+        # Relação R/X das linhas e dos transformadores (vk = sqrt(vkr² + vkx²))
+        line_x = lines.x_ohm_per_km.values
+        trafo_x = np.sqrt(np.maximum(trafos.vk_percent.values ** 2 - trafos.vkr_percent.values ** 2, 0.0))
+        r = np.concatenate((lines.r_ohm_per_km.values, trafos.vkr_percent.values))
+        x = np.concatenate((line_x, trafo_x))
+        rx = r[x > 0] / x[x > 0]
+
+        n_buses = len(net.bus)
+        return {
+            'buses': n_buses,
+            'branches': len(from_buses),
+            'radial': len(from_buses) == n_buses - 1 and self._is_connected(net.bus.index.values, from_buses, to_buses),
+            'max_rx': float(rx.max()) if len(rx) > 0 else 0.0,
+            'mean_rx': float(rx.mean()) if len(rx) > 0 else 0.0,
+        }
+
+    def _is_connected(self, buses: np.ndarray, from_buses: np.ndarray, to_buses: np.ndarray) -> bool:
+        """Verifica se os ramos conectam todas as barras (union-find)"""
+        parent = {int(b): int(b) for b in buses}
+
+        def find(b: int) -> int:
+            while parent[b] != b:
+                parent[b] = parent[parent[b]]
+                b = parent[b]
+            return b
+
+        for f, t in zip(from_buses, to_buses):
+            parent[find(int(f))] = find(int(t))
+
+        return len({find(b) for b in parent}) == 1
+
+    def candidate_chain(self, features: dict) -> List[str]:
+        """Cadeia heurística de algoritmos, do mais rápido esperado ao mais robusto"""
+        if features['radial']:
+            # Varredura direta/inversa é a escolha natural para redes radiais
+            return ['bfsw', 'nr', 'gs']
+        if features['max_rx'] > self.HIGH_RX_RATIO:
+            return ['nr', 'fdbx', 'gs']
+        if features['buses'] >= self.LARGE_NETWORK_BUSES:
+            return ['fdxb', 'nr', 'fdbx', 'gs']
+        return ['nr', 'fdxb', 'gs']
+
+    def rank_chain(self, key: str, chain: List[str]) -> List[str]:
+        """
+        Reordena a cadeia usando o histórico de tempos e falhas do caso.
+
+        A ordem heurística é a referência: algoritmos ainda não testados mantêm sua
+        posição, e um algoritmo medido só passa à frente de outro também medido e
+        mais lento. Algoritmos que falham com frequência vão para o fim da cadeia.
+        """
+        with self._lock:
+            history = self._history.get(key)
+            if history is not None:
+                self._history.move_to_end(key)
+            history = {alg: dict(stats) for alg, stats in (history or {}).items()}
+
+        def success_ratio(alg: str) -> float:
+            stats = history[alg]
+            return stats['runs'] / (stats['runs'] + stats['failures'])
+
+        def expected_time(alg: str) -> float:
+            # Tempo esperado até convergir: cada falha custa uma nova tentativa
+            ratio = success_ratio(alg)
+            return history[alg]['mean_time_s'] / ratio if ratio > 0 else float('inf')
+
+        unreliable = [alg for alg in chain if alg in history and success_ratio(alg) < self.MIN_SUCCESS_RATIO]
+        kept = [alg for alg in chain if alg not in unreliable]
+
+        # Os medidos trocam de lugar entre si; os não testados ficam onde a heurística os colocou
+        measured = iter(sorted(
+            (alg for alg in kept if alg in history),
+            key=lambda alg: (expected_time(alg), chain.index(alg))
+        ))
+        ranked = [next(measured) if alg in history else alg for alg in kept]
+
+        return ranked + sorted(unreliable, key=lambda alg: (expected_time(alg), chain.index(alg)))
+
+    def record(self, key: str, algorithm: str, execution_time: float, converged: bool):
+        """Registra o resultado de uma execução no histórico do caso"""
+        with self._lock:
+            case_history = self._history.setdefault(key, {})
+            self._history.move_to_end(key)
+            while len(self._history) > self.MAX_ENTRIES:
+                self._history.popitem(last=False)
+
+            stats = case_history.setdefault(
+                algorithm, {'runs': 0, 'failures': 0, 'mean_time_s': 0.0}
+            )
+            if not converged:
+                stats['failures'] += 1
+                return
+            if stats['runs'] == 0:
+                stats['mean_time_s'] = execution_time
+            else:
+                stats['mean_time_s'] += self.HISTORY_SMOOTHING * (execution_time - stats['mean_time_s'])
+            stats['runs'] += 1
+
+    def solve(self, net: pp.pandapowerNet) -> Tuple[str, List[AlgorithmAttempt], float]:
+        """
+        Executa o fluxo de potência percorrendo a cadeia até a primeira convergência.
+
+        Returns:
+            Tuple com o algoritmo que convergiu, as tentativas realizadas e o tempo da execução convergida
+        """
+        key = self.case_key(net)
+        chain = self.rank_chain(key, self.candidate_chain(self.network_features(net)))
+
+        attempts = []
+        for algorithm in chain:
+            start_time = time.time()
+            try:
+                with warnings.catch_warnings():
+                    warnings.filterwarnings("ignore", category=FutureWarning, module="pandas")
+                    warnings.filterwarnings("ignore", category=FutureWarning, module="pandapower")
+                    pp.runpp(net, algorithm=algorithm, numba=False, max_iteration=self.ITERATION_BUDGET[algorithm])
+            except Exception as e:
+                execution_time = time.time() - start_time
+                self.record(key, algorithm, execution_time, converged=False)
+                attempts.append(AlgorithmAttempt(
+                    algorithm=algorithm,
+                    converged=False,
+                    execution_time_s=execution_time,
+                    error=str(e)
+                ))
+                continue
+
+            execution_time = time.time() - start_time
+            self.record(key, algorithm, execution_time, converged=True)
+            iterations = net._ppc.get('iterations', 0) if isinstance(getattr(net, '_ppc', None), dict) else 0
+            attempts.append(AlgorithmAttempt(
+                algorithm=algorithm,
+                converged=True,
+                iterations=int(iterations),
+                execution_time_s=execution_time
+            ))
+            return algorithm, attempts, execution_time
+
+        tried = ', '.join(attempt.algorithm for attempt in attempts)
+        raise ValueError(f"Nenhum algoritmo convergiu (tentativas: {tried})")
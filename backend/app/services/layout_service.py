@@ -0,0 +1,261 @@
+import numpy as np
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+import pandapower as pp
+from app.models.power_system_results import BusPosition, NetworkLayout, PowerSystemResult
+
+class LayoutService:
+    """Layout da rede (posição das barras) calculado no servidor e cacheado por topologia"""
+
+    LAYOUT_METHODS = ('force', 'hierarchical')
+
+    # Quantidade de layouts mantidos em cache
+    MAX_ENTRIES = 64
+
+    # Iterações do algoritmo de Fruchterman-Reingold (redes de até FORCE_FULL_BUSES barras)
+    FORCE_ITERATIONS = 150
+
+    # Acima deste tamanho as iterações diminuem proporcionalmente ao número de barras,
+    # partindo do layout hierárquico, até o mínimo FORCE_MIN_ITERATIONS
+    FORCE_FULL_BUSES = 500
+    FORCE_MIN_ITERATIONS = 30
+
+    # Margem deixada nas bordas do layout normalizado em [0, 1]
+    MARGIN = 0.05
+
+    def __init__(self):
+        self._layouts: "OrderedDict[tuple, NetworkLayout]" = OrderedDict()
+        # Layouts em cálculo: requisições simultâneas da mesma topologia aguardam o mesmo resultado
+        self._pending: Dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+
+    def layout_from_net(self, net: pp.pandapowerNet, method: str = 'force') -> NetworkLayout:
+        """Layout a partir da rede pandapower (linhas e transformadores)"""
+        bus_ids = np.arange(len(net.bus))
+        positions = net.bus.index
+        from_buses = np.concatenate((positions.get_indexer(net.line.from_bus), positions.get_indexer(net.trafo.hv_bus)))
+        to_buses = np.concatenate((positions.get_indexer(net.line.to_bus), positions.get_indexer(net.trafo.lv_bus)))
+        root = int(positions.get_indexer([net.ext_grid.bus.iloc[0]])[0]) if len(net.ext_grid) > 0 else None
+        return self.compute(bus_ids, from_buses, to_buses, root, method)
+
+    def layout_from_result(self, result: PowerSystemResult, method: str = 'force') -> NetworkLayout:
+        """Layout a partir de um resultado de simulação (barras e linhas já convertidas)"""
+        bus_ids = np.array([bus.bus_id for bus in result.buses], dtype=int)
+        from_buses = np.array([line.from_bus for line in result.lines], dtype=int)
+        to_buses = np.array([line.to_bus for line in result.lines], dtype=int)
+        root = result.ext_grid.bus_id if result.ext_grid is not None else None
+        return self.compute(bus_ids, from_buses, to_buses, root, method)
+
+    def topology_hash(self, bus_ids: np.ndarray, from_buses: np.ndarray, to_buses: np.ndarray, root: Optional[int]) -> str:
+        """Hash da topologia: barras, ramos (sem orientação nem duplicatas) e barra de referência"""
+        edges = np.unique(np.sort(np.column_stack((from_buses, to_buses)).astype(np.int64), axis=1), axis=0)
+        digest = hashlib.sha1()
+        digest.update(np.asarray(bus_ids, dtype=np.int64).tobytes())
+        digest.update(edges.tobytes())
+        digest.update(str(root).encode())
+        return digest.hexdigest()
+
+    def compute(self, bus_ids: np.ndarray, from_buses: np.ndarray, to_buses: np.ndarray, root: Optional[int] = None, method: str = 'force') -> NetworkLayout:
+        """
+        Calcula (ou obtém do cache) o layout de uma topologia.
+
+        Chamadas simultâneas para a mesma topologia e método compartilham um único cálculo.
+        """
+        if method not in self.LAYOUT_METHODS:
+            raise ValueError(f"Método de layout inválido: {method}. Use um de: {', '.join(self.LAYOUT_METHODS)}")
+
+        topology_hash = self.topology_hash(bus_ids, from_buses, to_buses, root)
+        key = (topology_hash, method)
+        with self._lock:
+            layout = self._layouts.get(key)
+            if layout is not None:
+                self._layouts.move_to_end(key)
+                return layout
+            pending = self._pending.get(key)
+            if pending is None:
+                future = self._pending[key] = Future()
+
+        if pending is not None:
+            # Outra requisição já está calculando este layout
+            return pending.result()
+
+        try:
+            layout = self._build(bus_ids, from_buses, to_buses, root, method, topology_hash)
+        except BaseException as e:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._layouts[key] = layout
+            while len(self._layouts) > self.MAX_ENTRIES:
+                self._layouts.popitem(last=False)
+            del self._pending[key]
+        future.set_result(layout)
+        return layout
+
+    def _build(self, bus_ids: np.ndarray, from_buses: np.ndarray, to_buses: np.ndarray, root: Optional[int], method: str, topology_hash: str) -> NetworkLayout:
+        """Calcula o layout (sem cache)"""
+        # Ramos em índices posicionais das barras
+        index = {int(bus_id): i for i, bus_id in enumerate(bus_ids)}
+        edges = np.array(
+            [(index[int(f)], index[int(t)]) for f, t in zip(from_buses, to_buses) if int(f) in index and int(t) in index and f != t],
+            dtype=int
+        ).reshape(-1, 2)
+        root_index = index.get(int(root)) if root is not None else None
+
+        pos = self._hierarchical(len(bus_ids), edges, root_index)
+        if method == 'force':
+            pos = self._normalize(self._force_directed(pos, edges))
+        else:
+            pos = self._normalize(pos, keep_aspect=False)
+
+        return NetworkLayout(
+            topology_hash=topology_hash,
+            method=method,
+            buses=[BusPosition(bus_id=int(bus_id), x=float(x), y=float(y)) for bus_id, (x, y) in zip(bus_ids, pos)]
+        )
+
+    def _hierarchical(self, n: int, edges: np.ndarray, root: Optional[int]) -> np.ndarray:
+        """Camadas por busca em largura a partir da barra de referência (uma camada por nível)"""
+        neighbors: Dict[int, List[int]] = {i: [] for i in range(n)}
+        for f, t in edges:
+            neighbors[int(f)].append(int(t))
+            neighbors[int(t)].append(int(f))
+
+        depth = np.full(n, -1)
+        layers: List[List[int]] = []
+        starts = ([root] if root is not None else []) + list(range(n))
+        for start in starts:
+            if depth[start] >= 0:
+                continue
+            # Componentes desconectados continuam abaixo das camadas já existentes
+            depth[start] = len(layers)
+            frontier = [start]
+            while frontier:
+                if depth[frontier[0]] == len(layers):
+                    layers.append([])
+                layers[depth[frontier[0]]].extend(frontier)
+                next_frontier = []
+                for bus in frontier:
+                    for neighbor in sorted(neighbors[bus]):
+                        if depth[neighbor] < 0:
+                            depth[neighbor] = depth[bus] + 1
+                            next_frontier.append(neighbor)
+                frontier = next_frontier
+
+        # Ordem de descoberta na BFS mantém filhos próximos dos pais
+        pos = np.zeros((n, 2))
+        for level, layer in enumerate(layers):
+            pos[layer, 0] = (np.arange(len(layer)) + 1) / (len(layer) + 1)
+            pos[layer, 1] = level
+        return pos
+
+    def _force_directed(self, pos: np.ndarray, edges: np.ndarray) -> np.ndarray:
+        """
+        Fruchterman-Reingold vetorizado com repulsão em grade.
+
+        Como na variante em grade do artigo original, a repulsão só é calculada entre
+        barras a menos de 2k de distância: as barras são agrupadas em células de lado
+        2k e cada uma interage apenas com as das 9 células vizinhas. O custo por
+        iteração passa de O(n²) para O(n) em layouts sem aglomerações, e o número
+        de iterações diminui em redes grandes (ver _force_iterations).
+        """
+        n = len(pos)
+        if n < 2:
+            return pos
+
+        pos = self._normalize(pos, keep_aspect=False)
+        # Perturbação determinística para separar barras em posições coincidentes
+        pos = pos + np.random.default_rng(0).uniform(-1e-3, 1e-3, size=pos.shape)
+
+        k = np.sqrt(1.0 / n)
+        iterations = self._force_iterations(n)
+        temperature = 0.1
+        cooling = temperature / iterations
+
+        for _ in range(iterations):
+            displacement = self._grid_repulsion(pos, k)
+
+            # Atração entre barras conectadas: d² / k
+            if len(edges) > 0:
+                delta = pos[edges[:, 0]] - pos[edges[:, 1]]
+                dist = np.sqrt((delta ** 2).sum(axis=-1))
+                force = delta * (dist / k)[:, np.newaxis]
+                for axis in range(2):
+                    displacement[:, axis] -= np.bincount(edges[:, 0], weights=force[:, axis], minlength=n)
+                    displacement[:, axis] += np.bincount(edges[:, 1], weights=force[:, axis], minlength=n)
+
+            # Deslocamento limitado pela temperatura
+            length = np.maximum(np.sqrt((displacement ** 2).sum(axis=-1)), 1e-9)
+            pos = pos + displacement / length[:, np.newaxis] * np.minimum(length, temperature)[:, np.newaxis]
+            temperature = max(temperature - cooling, 1e-4)
+
+        return pos
+
+    def _force_iterations(self, n: int) -> int:
+        """Número de iterações do layout por forças para uma rede de n barras"""
+        if n <= self.FORCE_FULL_BUSES:
+            return self.FORCE_ITERATIONS
+        return max(self.FORCE_MIN_ITERATIONS, self.FORCE_ITERATIONS * self.FORCE_FULL_BUSES // n)
+
+    def _grid_repulsion(self, pos: np.ndarray, k: float) -> np.ndarray:
+        """Repulsão k² / d entre barras de células vizinhas (raio de corte 2k)"""
+        n = len(pos)
+        radius = 2 * k
+
+        # Célula de cada barra, com uma borda vazia para os deslocamentos -1/+1
+        cells = np.floor((pos - pos.min(axis=0)) / radius).astype(np.int64) + 1
+        width = cells[:, 1].max() + 2
+        keys = cells[:, 0] * width + cells[:, 1]
+
+        order = np.argsort(keys, kind='stable')
+        cell_keys, cell_starts, cell_counts = np.unique(keys[order], return_index=True, return_counts=True)
+
+        displacement = np.zeros_like(pos)
+        # Metade da vizinhança: cada par de células é visitado uma vez e a força
+        # é aplicada às duas barras com sinais opostos
+        for dx, dy in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+            # Célula vizinha de cada barra e seu intervalo em `order`
+            neighbor = keys + dx * width + dy
+            slot = np.minimum(np.searchsorted(cell_keys, neighbor), len(cell_keys) - 1)
+            sources = np.nonzero(cell_keys[slot] == neighbor)[0]
+            if len(sources) == 0:
+                continue
+            counts = cell_counts[slot[sources]]
+
+            # Todos os pares (barra, barra da célula vizinha) sem laço Python
+            i = np.repeat(sources, counts)
+            within = np.arange(len(i)) - np.repeat(np.cumsum(counts) - counts, counts)
+            j = order[np.repeat(cell_starts[slot[sources]], counts) + within]
+
+            delta = pos[i] - pos[j]
+            dist2 = (delta ** 2).sum(axis=-1)
+            mask = dist2 < radius * radius
+            if dx == 0 and dy == 0:
+                # Mesma célula: cada par uma única vez
+                mask &= i < j
+            i, j, delta = i[mask], j[mask], delta[mask]
+            scale = k * k / np.maximum(dist2[mask], 1e-9)
+            for axis in range(2):
+                force = delta[:, axis] * scale
+                displacement[:, axis] += np.bincount(i, weights=force, minlength=n)
+                displacement[:, axis] -= np.bincount(j, weights=force, minlength=n)
+
+        return displacement
+
+    def _normalize(self, pos: np.ndarray, keep_aspect: bool = True) -> np.ndarray:
+        """Ajusta as posições ao quadrado [0, 1], preservando ou não a proporção entre os eixos"""
+        if len(pos) == 0:
+            return pos
+        lower = pos.min(axis=0)
+        span = pos.max(axis=0) - lower
+        if keep_aspect:
+            span = np.full(2, span.max())
+        # Eixo sem variação fica centralizado
+        scaled = np.divide(pos - lower, span, out=np.full_like(pos, 0.5), where=span > 0)
+        return self.MARGIN + (1 - 2 * self.MARGIN) * scaled
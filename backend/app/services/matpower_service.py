@@ -1,8 +1,11 @@
 import pandapower as pp
 from pandapower.converter.matpower import from_mpc
 from app.models.power_system_results import PowerSystemResult
+from app.services.algorithm_selector import AlgorithmSelector
+from app.services.profiling_service import RequestProfiler
+from contextlib import nullcontext
 import os
-from typing import List
+from typing import List, Optional
 
 class MatpowerService:
     # Constante para controlar prints de debug
@@ -15,12 +18,19 @@ class MatpowerService:
         # Garantir que o diretório existe
         if not os.path.exists(self.data_dir):
             raise ValueError(f"Diretório de dados não encontrado: {self.data_dir}")
+        
+        # Seleção automática de algoritmo (algorithm=auto) com histórico por caso
+        self.algorithm_selector = AlgorithmSelector()
     
     def _debug_print(self, message: str):
         """Método auxiliar para prints de debug condicionais"""
         if self.DEBUG_ENABLED:
             print(f"DEBUG: {message}")
     
+    def _profile_phase(self, profiler: Optional[RequestProfiler], name: str):
+        """Marca uma fase no profiler da requisição (sem custo quando desligado)"""
+        return profiler.phase(name) if profiler is not None else nullcontext()
+    
     def list_available_files(self) -> List[str]:
         """Lista todos os arquivos MATPOWER disponíveis"""
         try:
@@ -95,8 +105,8 @@ class MatpowerService:
         
         return '\n'.join(modified_lines)
 
-    def simulate_from_filename(self, filename: str, algorithm: str = 'nr') -> PowerSystemResult:
-        """Simula um sistema a partir de um arquivo MATPOWER"""
+    def load_net_from_filename(self, filename: str) -> pp.pandapowerNet:
+        """Carrega a rede pandapower a partir de um arquivo MATPOWER do diretório de dados"""
         import tempfile
         
         temp_file = None
@@ -128,11 +138,8 @@ class MatpowerService:
                 raise ValueError(f"Erro ao ler/processar o modelo {filename}: {str(e)}")
             
             # Converter do arquivo temporário corrigido
-            net = from_mpc(temp_file)
-            return self._run_simulation(net, algorithm)
+            return from_mpc(temp_file)
             
-        except Exception as e:
-            raise ValueError(f"Erro ao simular a partir do modelo {filename}: {str(e)}")
         finally:
             # Limpar arquivo temporário
             if temp_file and os.path.exists(temp_file):
@@ -141,8 +148,8 @@ class MatpowerService:
                 except:
                     pass
 
-    def simulate_from_string(self, matpower_string: str, algorithm: str = 'nr') -> PowerSystemResult:
-        """Simula um sistema a partir de uma string MATPOWER"""
+    def load_net_from_string(self, matpower_string: str) -> pp.pandapowerNet:
+        """Carrega a rede pandapower a partir de uma string MATPOWER"""
         import tempfile
         import warnings
         
@@ -162,31 +169,66 @@ class MatpowerService:
                 self._debug_print(f"Criando rede a partir do arquivo: {tmp_path}")
                 net = from_mpc(tmp_path)
                 self._debug_print(f"Rede criada com sucesso. Buses: {len(net.bus)}")
-                return self._run_simulation(net, algorithm)
-            except Exception as e:
-                self._debug_print(f"Erro ao criar/simular rede: {str(e)}")
-                raise ValueError(f"Erro ao processar o arquivo MATPOWER: {str(e)}")
+                return net
             finally:
                 os.unlink(tmp_path)
 
-    def _run_simulation(self, net: pp.pandapowerNet, algorithm: str = 'nr') -> PowerSystemResult:
+    def simulate_from_filename(self, filename: str, algorithm: str = 'nr', profiler: Optional[RequestProfiler] = None) -> PowerSystemResult:
+        """Simula um sistema a partir de um arquivo MATPOWER"""
+        try:
+            with self._profile_phase(profiler, 'parse'):
+                net = self.load_net_from_filename(filename)
+            return self._run_simulation(net, algorithm, profiler)
+        except Exception as e:
+            raise ValueError(f"Erro ao simular a partir do modelo {filename}: {str(e)}")
+
+    def simulate_from_string(self, matpower_string: str, algorithm: str = 'nr', profiler: Optional[RequestProfiler] = None) -> PowerSystemResult:
+        """Simula um sistema a partir de uma string MATPOWER"""
+        try:
+            with self._profile_phase(profiler, 'parse'):
+                net = self.load_net_from_string(matpower_string)
+            return self._run_simulation(net, algorithm, profiler)
+        except Exception as e:
+            self._debug_print(f"Erro ao criar/simular rede: {str(e)}")
+            raise ValueError(f"Erro ao processar o arquivo MATPOWER: {str(e)}")
+
+    def _run_simulation(self, net: pp.pandapowerNet, algorithm: str = 'nr', profiler: Optional[RequestProfiler] = None) -> PowerSystemResult:
         """Executa a simulação e converte os resultados"""
         import warnings
         import time
         
         try:
             # Suprimir warnings específicos do pandas/pandapower
-            with warnings.catch_warnings():
+            with warnings.catch_warnings(), self._profile_phase(profiler, 'solve'):
                 warnings.filterwarnings("ignore", category=FutureWarning, module="pandas")
                 warnings.filterwarnings("ignore", category=FutureWarning, module="pandapower")
                 
                 self._debug_print(f"Iniciando simulação com algoritmo: {algorithm}...")
-                start_time = time.time()
+                attempts = []
                 
-                # Executar com algoritmo especificado
-                pp.runpp(net, algorithm=algorithm, numba=False)
+                if algorithm == 'auto':
+                    # Selecionar o algoritmo pelas características da rede, com fallback
+                    algorithm, attempts, execution_time = self.algorithm_selector.solve(net)
+                    self._debug_print(f"Algoritmo selecionado automaticamente: {algorithm} ({len(attempts)} tentativa(s))")
+                else:
+                    start_time = time.time()
+                    record_history = algorithm in self.algorithm_selector.ITERATION_BUDGET
+                    
+                    # Executar com algoritmo especificado
+                    try:
+                        pp.runpp(net, algorithm=algorithm, numba=False)
+                    except Exception:
+                        # Alimentar o histórico de falhas usado pelo modo auto
+                        if record_history:
+                            self.algorithm_selector.record(self.algorithm_selector.case_key(net), algorithm, time.time() - start_time, converged=False)
+                        raise
+                    
+                    execution_time = time.time() - start_time
+                    
+                    # Alimentar o histórico de tempos usado pelo modo auto
+                    if record_history:
+                        self.algorithm_selector.record(self.algorithm_selector.case_key(net), algorithm, execution_time, converged=True)
                 
-                execution_time = time.time() - start_time
                 self._debug_print("Simulação concluída com sucesso")
                 self._debug_print(f"Tempo de execução: {execution_time:.4f}s")
                 
@@ -242,9 +284,10 @@ class MatpowerService:
         
         self._debug_print(f"Iterações finais: {iterations}, Tempo: {execution_time:.4f}s")
         
-        return self._convert_results(net, iterations, execution_time, algorithm)
+        with self._profile_phase(profiler, 'conversion'):
+            return self._convert_results(net, iterations, execution_time, algorithm, attempts)
 
-    def _convert_results(self, net: pp.pandapowerNet, iterations: int = 0, execution_time: float = 0.0, algorithm: str = 'nr') -> PowerSystemResult:
+    def _convert_results(self, net: pp.pandapowerNet, iterations: int = 0, execution_time: float = 0.0, algorithm: str = 'nr', attempts: list = None) -> PowerSystemResult:
         """Converte os resultados do pandapower para nosso formato"""
         from app.models.power_system_results import (
             BusResult, LineResult, LoadResult, 
@@ -454,5 +497,6 @@ class MatpowerService:
             loadSystemQ=load_system_q,
             iterations=iterations,
             execution_time_s=execution_time,
-            algorithm=algorithm
+            algorithm=algorithm,
+            attempts=attempts or []
         )
\ No newline at end of file
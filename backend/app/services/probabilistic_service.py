@@ -0,0 +1,287 @@
+import pandapower as pp
+import numpy as np
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+from app.models.probabilistic_results import (
+    InjectionDistribution, ProbabilisticPowerFlowRequest, ProbabilisticPowerFlowResult,
+    BusVoltageStatistics, LineLoadingStatistics, LossStatistics
+)
+from app.services.matpower_service import MatpowerService
+
+# Algoritmos suportados no fluxo de potência probabilístico (apenas fluxo AC)
+PROBABILISTIC_ALGORITHMS = ('nr', 'fdxb', 'fdbx', 'bfsw', 'gs')
+
+# Algoritmos que reaproveitam a estrutura interna via `recycle` no pandapower;
+# nos demais o recycle é ignorado (com aviso) e a Ybus é recalculada a cada amostra
+RECYCLE_ALGORITHMS = ('nr',)
+
+# Limite global de processos, compartilhado por todas as requisições
+MAX_POOL_WORKERS = int(os.getenv('SISEP_PROBABILISTIC_MAX_WORKERS', str(os.cpu_count() or 1)))
+
+# Pool único do módulo, criado sob demanda
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    Retorna o pool de processos compartilhado.
+
+    Usa 'spawn': o servidor é multithread (uvicorn + threadpool) e fazer fork
+    de um processo com threads e NumPy/BLAS pode travar o filho.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(
+                max_workers=MAX_POOL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _POOL
+
+
+def _discard_pool():
+    """Descarta um pool quebrado (processo filho encerrado) para recriá-lo na próxima requisição"""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False)
+            _POOL = None
+
+
+def _solve_batch(net: pp.pandapowerNet, load_factors: np.ndarray, gen_factors: np.ndarray, algorithm: str) -> dict:
+    """
+    Resolve um lote de amostras sobre a mesma rede.
+
+    Apenas as injeções são alteradas entre amostras, então cada solução parte da
+    anterior (`init='results'`). No Newton-Raphson a estrutura interna (ppc) e a
+    matriz Ybus também são reaproveitadas via `recycle`.
+    """
+    import warnings
+
+    base_load_p = net.load.p_mw.values.copy()
+    base_load_q = net.load.q_mvar.values.copy()
+    base_gen_p = net.gen.p_mw.values.copy()
+
+    n_samples = load_factors.shape[0]
+    n_branches = len(net.line) + len(net.trafo)
+    vm = np.full((n_samples, len(net.bus)), np.nan)
+    loading = np.full((n_samples, n_branches), np.nan)
+    losses = np.full(n_samples, np.nan)
+    converged = np.zeros(n_samples, dtype=bool)
+
+    warm_start = False
+    use_recycle = algorithm in RECYCLE_ALGORITHMS
+    try:
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", category=FutureWarning, module="pandas")
+            warnings.filterwarnings("ignore", category=FutureWarning, module="pandapower")
+
+            for k in range(n_samples):
+                net.load['p_mw'] = base_load_p * load_factors[k]
+                net.load['q_mvar'] = base_load_q * load_factors[k]
+                net.gen['p_mw'] = base_gen_p * gen_factors[k]
+
+                try:
+                    # Sem solução anterior válida (início do lote ou após divergência) as
+                    # variáveis internas não existem: recalcula a estrutura sem recycle
+                    pp.runpp(
+                        net,
+                        algorithm=algorithm,
+                        numba=False,
+                        init='results' if warm_start else 'auto',
+                        recycle=dict(trafo=False, gen=True, bus_pq=True) if warm_start and use_recycle else None
+                    )
+                except Exception:
+                    # Divergência ou falha do solver na amostra (ex.: LoadflowNotConverged):
+                    # conta como não convergida e a próxima parte novamente do perfil plano
+                    warm_start = False
+                    continue
+
+                warm_start = True
+                converged[k] = True
+                vm[k] = net.res_bus.vm_pu.values
+                loading[k] = np.concatenate((
+                    net.res_line.loading_percent.values if len(net.line) > 0 else np.empty(0),
+                    net.res_trafo.loading_percent.values if len(net.trafo) > 0 else np.empty(0)
+                ))
+                losses[k] = (net.res_line.pl_mw.sum() if len(net.line) > 0 else 0.0) + \
+                            (net.res_trafo.pl_mw.sum() if len(net.trafo) > 0 else 0.0)
+    finally:
+        # Restaurar o caso base para os próximos lotes do mesmo processo
+        net.load['p_mw'] = base_load_p
+        net.load['q_mvar'] = base_load_q
+        net.gen['p_mw'] = base_gen_p
+
+    return {'vm': vm, 'loading': loading, 'losses': losses, 'converged': converged}
+
+
+class ProbabilisticService:
+    """Fluxo de potência probabilístico por Monte Carlo"""
+
+    def __init__(self, matpower_service: MatpowerService):
+        self.matpower_service = matpower_service
+
+    def simulate_from_filename(self, filename: str, request: ProbabilisticPowerFlowRequest) -> ProbabilisticPowerFlowResult:
+        """Executa o fluxo de potência probabilístico a partir de um arquivo MATPOWER"""
+        if request.algorithm not in PROBABILISTIC_ALGORITHMS:
+            raise ValueError(
+                f"Algoritmo inválido para fluxo probabilístico: {request.algorithm}. "
+                f"Use um de: {', '.join(PROBABILISTIC_ALGORITHMS)}"
+            )
+
+        try:
+            net = self.matpower_service.load_net_from_filename(filename)
+        except Exception as e:
+            raise ValueError(f"Erro ao carregar o modelo {filename}: {str(e)}")
+
+        # A varredura direta/inversa só resolve redes radiais; em redes malhadas todas as amostras falhariam
+        if request.algorithm == 'bfsw' and not self.matpower_service.algorithm_selector.network_features(net)['radial']:
+            raise ValueError(
+                f"O algoritmo bfsw exige uma rede radial, mas {filename} é malhada. "
+                f"Use um de: {', '.join(alg for alg in PROBABILISTIC_ALGORITHMS if alg != 'bfsw')}"
+            )
+
+        return self._run_monte_carlo(net, request)
+
+    def _sample_factors(self, rng: np.random.Generator, distribution: InjectionDistribution, shape: tuple) -> np.ndarray:
+        """Sorteia os fatores multiplicativos de uma vez para todas as amostras"""
+        if distribution.distribution == 'normal':
+            factors = rng.normal(distribution.mean, distribution.std, size=shape)
+        elif distribution.distribution == 'uniform':
+            factors = rng.uniform(distribution.mean - distribution.std, distribution.mean + distribution.std, size=shape)
+        else:
+            raise ValueError(f"Distribuição inválida: {distribution.distribution}. Use normal ou uniform")
+
+        # Injeções não mudam de sinal
+        return np.clip(factors, 0.0, None)
+
+    def _resolve_workers(self, requested: int, n_batches: int) -> int:
+        """Define o número de processos, limitado ao número de lotes e ao tamanho do pool"""
+        workers = requested if requested > 0 else MAX_POOL_WORKERS
+        return max(1, min(workers, MAX_POOL_WORKERS, n_batches))
+
+    def _solve_in_pool(self, net: pp.pandapowerNet, batches: list, algorithm: str, workers: int) -> List[dict]:
+        """Resolve os lotes no pool compartilhado, com no máximo `workers` lotes simultâneos"""
+        pool = _get_pool()
+        results: List[Optional[dict]] = [None] * len(batches)
+        pending = {}
+        try:
+            for i, (lf, gf) in enumerate(batches):
+                if len(pending) >= workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[pending.pop(future)] = future.result()
+                pending[pool.submit(_solve_batch, net, lf, gf, algorithm)] = i
+            for future in list(pending):
+                results[pending.pop(future)] = future.result()
+        except BrokenProcessPool:
+            _discard_pool()
+            raise
+        finally:
+            for future in pending:
+                future.cancel()
+        return results
+
+    def _run_monte_carlo(self, net: pp.pandapowerNet, request: ProbabilisticPowerFlowRequest) -> ProbabilisticPowerFlowResult:
+        """Sorteia as amostras, resolve os lotes e agrega as estatísticas"""
+        start_time = time.time()
+
+        rng = np.random.default_rng(request.seed)
+        load_factors = self._sample_factors(rng, request.load, (request.samples, len(net.load)))
+        gen_factors = self._sample_factors(rng, request.generation, (request.samples, len(net.gen)))
+
+        bounds = list(range(0, request.samples, request.batch_size)) + [request.samples]
+        batches = [(load_factors[a:b], gen_factors[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+        workers = self._resolve_workers(request.workers, len(batches))
+
+        if workers == 1:
+            # Um único processo: evita o custo de serializar a rede
+            results = [_solve_batch(net, lf, gf, request.algorithm) for lf, gf in batches]
+        else:
+            # A rede é enviada com cada lote; os processos são reaproveitados entre requisições
+            results = self._solve_in_pool(net, batches, request.algorithm, workers)
+
+        converged = np.concatenate([r['converged'] for r in results])
+        vm = np.concatenate([r['vm'] for r in results])[converged]
+        loading = np.concatenate([r['loading'] for r in results])[converged]
+        losses = np.concatenate([r['losses'] for r in results])[converged]
+
+        n_converged = int(converged.sum())
+        if n_converged == 0:
+            raise ValueError("Nenhuma amostra do fluxo de potência probabilístico convergiu")
+
+        return ProbabilisticPowerFlowResult(
+            samples=request.samples,
+            converged_samples=n_converged,
+            convergence_rate=n_converged / request.samples,
+            buses=self._bus_statistics(vm, request.percentiles),
+            lines=self._line_statistics(net, loading, request.loading_threshold),
+            losses=self._loss_statistics(losses, request.percentiles),
+            algorithm=request.algorithm,
+            batches=len(batches),
+            workers=workers,
+            execution_time_s=time.time() - start_time
+        )
+
+    def _percentile_dict(self, values: np.ndarray, percentiles: List[float]) -> List[dict]:
+        """Calcula os percentis por coluna e devolve um dicionário por coluna"""
+        if not percentiles:
+            return [{} for _ in range(values.shape[1])]
+
+        keys = [f"p{p:g}" for p in percentiles]
+        table = np.percentile(values, percentiles, axis=0)
+        return [dict(zip(keys, map(float, table[:, j]))) for j in range(values.shape[1])]
+
+    def _bus_statistics(self, vm: np.ndarray, percentiles: List[float]) -> List[BusVoltageStatistics]:
+        """Estatísticas de módulo de tensão por barra"""
+        mean, std = vm.mean(axis=0), vm.std(axis=0)
+        vmin, vmax = vm.min(axis=0), vm.max(axis=0)
+        pct = self._percentile_dict(vm, percentiles)
+
+        return [
+            BusVoltageStatistics(
+                bus_id=int(i),
+                vm_mean_pu=float(mean[i]),
+                vm_std_pu=float(std[i]),
+                vm_min_pu=float(vmin[i]),
+                vm_max_pu=float(vmax[i]),
+                vm_percentiles_pu=pct[i]
+            )
+            for i in range(vm.shape[1])
+        ]
+
+    def _line_statistics(self, net: pp.pandapowerNet, loading: np.ndarray, threshold: float) -> List[LineLoadingStatistics]:
+        """Estatísticas de carregamento por linha e transformador (mesma ordem de PowerSystemResult.lines)"""
+        from_buses = np.concatenate((net.line.from_bus.values, net.trafo.hv_bus.values)).astype(int)
+        to_buses = np.concatenate((net.line.to_bus.values, net.trafo.lv_bus.values)).astype(int)
+
+        mean = loading.mean(axis=0)
+        vmax = loading.max(axis=0)
+        exceedance = (loading > threshold).mean(axis=0)
+
+        return [
+            LineLoadingStatistics(
+                from_bus=int(from_buses[i]),
+                to_bus=int(to_buses[i]),
+                loading_mean_percent=float(mean[i]),
+                loading_max_percent=float(vmax[i]),
+                exceedance_probability=float(exceedance[i])
+            )
+            for i in range(loading.shape[1])
+        ]
+
+    def _loss_statistics(self, losses: np.ndarray, percentiles: List[float]) -> LossStatistics:
+        """Distribuição das perdas ativas totais"""
+        return LossStatistics(
+            mean_mw=float(losses.mean()),
+            std_mw=float(losses.std()),
+            min_mw=float(losses.min()),
+            max_mw=float(losses.max()),
+            percentiles_mw=self._percentile_dict(losses[:, np.newaxis], percentiles)[0]
+        )
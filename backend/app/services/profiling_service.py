@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import time
+import uuid
+import tempfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import List
+from app.models.power_system_results import ProfileFunction, ProfileSummary
+
+class RequestProfiler:
+    """
+    Profiler por amostragem de uma única requisição.
+
+    Uma thread auxiliar captura periodicamente a pilha da thread que atende a
+    requisição. As amostras são agrupadas pela fase corrente (parse, solve,
+    conversion) para gerar pilhas colapsadas e um arquivo speedscope.
+    """
+
+    def __init__(self, interval_s: float = 0.001):
+        self.interval_s = interval_s
+        self.stacks: Counter = Counter()
+        self.phases = {}
+        self._current_phase = 'other'
+        self._target_ident = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.started_at = 0.0
+        self.duration_s = 0.0
+
+    def __enter__(self):
+        self._target_ident = threading.get_ident()
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._sample_loop, name="sisep-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop_event.set()
+        self._thread.join()
+        self.duration_s = time.time() - self.started_at
+        return False
+
+    @contextmanager
+    def phase(self, name: str):
+        """Marca uma fase da requisição e mede sua duração"""
+        previous = self._current_phase
+        self._current_phase = name
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + (time.time() - start_time)
+            self._current_phase = previous
+
+    def _sample_loop(self):
+        """Captura a pilha da thread alvo a cada intervalo"""
+        while not self._stop_event.wait(self.interval_s):
+            frame = sys._current_frames().get(self._target_ident)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+
+            self.stacks[(self._current_phase,) + tuple(stack)] += 1
+
+    @staticmethod
+    def _frame_name(frame: tuple) -> str:
+        name, filename, line = frame
+        return f"{name} ({os.path.basename(filename)}:{line})"
+
+    def collapsed(self) -> str:
+        """Pilhas colapsadas (formato flamegraph.pl: 'fase;f1;f2 contagem')"""
+        lines = []
+        for (phase, *frames), count in self.stacks.most_common():
+            names = [f"phase:{phase}"] + [self._frame_name(frame) for frame in frames]
+            lines.append(f"{';'.join(names)} {count}")
+        return '\n'.join(lines)
+
+    def speedscope(self, name: str) -> dict:
+        """Perfil no formato de arquivo do speedscope (tipo 'sampled')"""
+        frames, frame_index = [], {}
+
+        def index_of(key: tuple, frame: dict) -> int:
+            if key not in frame_index:
+                frame_index[key] = len(frames)
+                frames.append(frame)
+            return frame_index[key]
+
+        samples, weights = [], []
+        for (phase, *stack), count in self.stacks.items():
+            sample = [index_of(('phase', phase), {'name': f"phase:{phase}"})]
+            for frame in stack:
+                func, filename, line = frame
+                sample.append(index_of(frame, {'name': func, 'file': filename, 'line': line}))
+            samples.append(sample)
+            weights.append(count * self.interval_s)
+
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'sisep',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights,
+            }],
+        }
+
+    def top_functions(self, limit: int = 20) -> List[ProfileFunction]:
+        """Funções com mais amostras próprias (self) e acumuladas (total)"""
+        self_counts, total_counts = Counter(), Counter()
+        for (_, *stack), count in self.stacks.items():
+            if not stack:
+                continue
+            self_counts[stack[-1]] += count
+            for frame in set(stack):
+                total_counts[frame] += count
+
+        total_samples = sum(self.stacks.values()) or 1
+        return [
+            ProfileFunction(
+                name=frame[0],
+                file=frame[1],
+                line=frame[2],
+                self_samples=self_counts[frame],
+                total_samples=total_counts[frame],
+                self_percent=100.0 * self_counts[frame] / total_samples
+            )
+            for frame, _ in self_counts.most_common(limit)
+        ]
+
+
+class ProfilingService:
+    """Criação e armazenamento dos perfis por requisição"""
+
+    # Perfilamento sob demanda só é aceito quando habilitado por configuração
+    PROFILING_ENABLED = os.getenv('SISEP_PROFILING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
+    # Diretório onde os artefatos de perfil são gravados
+    PROFILE_DIR = os.getenv('SISEP_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'sisep_profiles'))
+
+    # Quantidade de perfis mantidos em disco (os mais antigos são removidos)
+    MAX_PROFILES = int(os.getenv('SISEP_PROFILE_MAX_FILES', '50'))
+
+    def create_profiler(self) -> RequestProfiler:
+        """Cria um profiler para a requisição atual"""
+        if not self.PROFILING_ENABLED:
+            raise PermissionError("Perfilamento desabilitado. Defina SISEP_PROFILING_ENABLED=true para habilitar")
+        return RequestProfiler()
+
+    def save(self, profiler: RequestProfiler, name: str) -> ProfileSummary:
+        """Grava os artefatos (speedscope e pilhas colapsadas) e retorna o resumo"""
+        os.makedirs(self.PROFILE_DIR, exist_ok=True)
+        profile_id = uuid.uuid4().hex
+
+        with open(self._artifact_path(profile_id, 'speedscope'), 'w') as f:
+            json.dump(profiler.speedscope(name), f)
+        with open(self._artifact_path(profile_id, 'collapsed'), 'w') as f:
+            f.write(profiler.collapsed())
+        self._prune(keep=profile_id)
+
+        return ProfileSummary(
+            profile_id=profile_id,
+            duration_s=profiler.duration_s,
+            samples=sum(profiler.stacks.values()),
+            phases=dict(profiler.phases),
+            top_functions=profiler.top_functions()
+        )
+
+    def load(self, profile_id: str, fmt: str = 'speedscope') -> str:
+        """Lê um artefato de perfil gravado"""
+        if fmt not in ('speedscope', 'collapsed'):
+            raise ValueError(f"Formato de perfil inválido: {fmt}. Use speedscope ou collapsed")
+        # O identificador é sempre um uuid hexadecimal
+        if len(profile_id) != 32 or any(c not in '0123456789abcdef' for c in profile_id):
+            raise ValueError(f"Identificador de perfil inválido: {profile_id}")
+
+        path = self._artifact_path(profile_id, fmt)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Perfil não encontrado: {profile_id}")
+        with open(path, 'r') as f:
+            return f.read()
+
+    def _prune(self, keep: str):
+        """Mantém apenas os MAX_PROFILES perfis mais recentes no diretório (incluindo `keep`)"""
+        profiles = {}
+        for entry in os.scandir(self.PROFILE_DIR):
+            profile_id, _, extension = entry.name.partition('.')
+            if extension not in ('speedscope.json', 'collapsed.txt'):
+                continue
+            try:
+                mtime = entry.stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+            profiles.setdefault(profile_id, []).append((mtime, entry.path))
+
+        # O perfil recém gravado vem primeiro mesmo se o relógio do sistema de arquivos empatar
+        newest_first = sorted(
+            profiles.items(),
+            key=lambda item: (item[0] == keep, max(mtime for mtime, _ in item[1])),
+            reverse=True
+        )
+        for _, files in newest_first[max(self.MAX_PROFILES, 1):]:
+            for _, path in files:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    # Removido por outra requisição concorrente
+                    pass
+
+    def _artifact_path(self, profile_id: str, fmt: str) -> str:
+        extension = 'speedscope.json' if fmt == 'speedscope' else 'collapsed.txt'
+        return os.path.join(self.PROFILE_DIR, f"{profile_id}.{extension}")
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from fastapi.encoders import jsonable_encoder
+from app.models.power_system_results import (
+    PowerSystemResult, PowerSystemResultDelta,
+    IndexedLineResult, IndexedLoadResult, IndexedGeneratorResult
+)
+
+class ResultDeltaService:
+    """ETags e respostas incrementais para re-simulações de um caso editado"""
+
+    # Quantidade de resultados mantidos para comparação
+    MAX_ENTRIES = 128
+
+    # Maior tolerância aceita (mesma unidade das grandezas: pu, graus, MW, MVAr, kA, %)
+    MAX_TOLERANCE = 1.0
+
+    # Campos que variam a cada execução e não participam do ETag
+    VOLATILE_FIELDS = {'execution_time_s', 'attempts', 'profile'}
+
+    # Campos de resumo sempre enviados na resposta incremental
+    SUMMARY_FIELDS = (
+        'genCapacityP', 'genCapacityQmin', 'genCapacityQmax', 'loadSystemP', 'loadSystemQ',
+        'iterations', 'execution_time_s', 'algorithm'
+    )
+
+    def __init__(self):
+        self._results: "OrderedDict[str, PowerSystemResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def etag(self, result: PowerSystemResult) -> str:
+        """Hash do conteúdo do resultado, ignorando campos voláteis"""
+        content = jsonable_encoder(result, exclude=self.VOLATILE_FIELDS)
+        return hashlib.sha1(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+    def store(self, result: PowerSystemResult) -> str:
+        """Guarda o resultado (o que o cliente passa a ter) e retorna seu ETag"""
+        tag = self.etag(result)
+        with self._lock:
+            self._results[tag] = result
+            self._results.move_to_end(tag)
+            while len(self._results) > self.MAX_ENTRIES:
+                self._results.popitem(last=False)
+        return tag
+
+    def get(self, tag: str) -> Optional[PowerSystemResult]:
+        """Retorna um resultado guardado pelo ETag"""
+        with self._lock:
+            result = self._results.get(tag)
+            if result is not None:
+                self._results.move_to_end(tag)
+            return result
+
+    @staticmethod
+    def parse_if_none_match(header: Optional[str]) -> List[str]:
+        """Extrai os ETags do header If-None-Match (aceita W/ e aspas)"""
+        if not header:
+            return []
+        tags = []
+        for tag in header.split(','):
+            tag = tag.strip()
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            tags.append(tag.strip('"'))
+        return [tag for tag in tags if tag]
+
+    def _changed(self, old, new, tolerance: float) -> bool:
+        """
+        Verifica se algum valor do elemento mudou além da tolerância.
+
+        A tolerância vale apenas para grandezas em ponto flutuante; identificadores
+        (bus_id, from_bus, to_bus), inteiros, booleanos e textos são comparados exatamente.
+        """
+        old_values, new_values = jsonable_encoder(old), jsonable_encoder(new)
+        for field, value in new_values.items():
+            previous = old_values.get(field)
+            if isinstance(value, float) and isinstance(previous, float):
+                if abs(value - previous) > tolerance:
+                    return True
+            elif value != previous:
+                return True
+        return False
+
+    def _diff_list(self, old: list, new: list, tolerance: float) -> Tuple[List[int], list]:
+        """Índices alterados e lista mesclada (valores antigos onde não houve mudança)"""
+        changed = [i for i, (a, b) in enumerate(zip(old, new)) if self._changed(a, b, tolerance)]
+        merged = list(old)
+        for i in changed:
+            merged[i] = new[i]
+        return changed, merged
+
+    def diff(self, base: PowerSystemResult, result: PowerSystemResult, tolerance: float) -> Optional[Tuple[PowerSystemResultDelta, PowerSystemResult]]:
+        """
+        Compara o novo resultado com o resultado base do cliente.
+
+        Returns:
+            None se a estrutura da rede mudou (é necessário enviar o resultado completo);
+            caso contrário, a resposta incremental e o resultado mesclado que o cliente
+            terá após aplicá-la (usado para o novo ETag, evitando deriva abaixo da tolerância).
+        """
+        for field in ('buses', 'lines', 'loads', 'generators'):
+            if len(getattr(base, field) or []) != len(getattr(result, field) or []):
+                return None
+        if (base.ext_grid is None) != (result.ext_grid is None):
+            return None
+        # Layout incluído/removido ou topologia diferente (ex.: ramo religado): resultado completo
+        if (base.layout is None) != (result.layout is None):
+            return None
+        if result.layout is not None and base.layout.topology_hash != result.layout.topology_hash:
+            return None
+
+        changed_buses, buses = self._diff_list(base.buses, result.buses, tolerance)
+        changed_lines, lines = self._diff_list(base.lines, result.lines, tolerance)
+        changed_loads, loads = self._diff_list(base.loads or [], result.loads or [], tolerance)
+        changed_gens, generators = self._diff_list(base.generators or [], result.generators or [], tolerance)
+
+        ext_grid_changed = result.ext_grid is not None and self._changed(base.ext_grid, result.ext_grid, tolerance)
+
+        # Mesma topologia, mas o layout pode diferir (ex.: outro layout_method)
+        layout_changed = result.layout is not None and jsonable_encoder(base.layout) != jsonable_encoder(result.layout)
+
+        summary = {field: getattr(result, field) for field in self.SUMMARY_FIELDS}
+        summary_changed = self._changed(
+            {field: getattr(base, field) for field in self.SUMMARY_FIELDS if field not in self.VOLATILE_FIELDS},
+            {field: value for field, value in summary.items() if field not in self.VOLATILE_FIELDS},
+            tolerance
+        )
+
+        merged = PowerSystemResult(**{
+            **jsonable_encoder(result),
+            'buses': buses,
+            'lines': lines,
+            'loads': loads,
+            'generators': generators,
+            'ext_grid': result.ext_grid if ext_grid_changed else base.ext_grid,
+            'layout': result.layout,
+        })
+
+        delta = PowerSystemResultDelta(
+            base_etag=self.etag(base),
+            etag=self.etag(merged),
+            tolerance=tolerance,
+            changed=bool(changed_buses or changed_lines or changed_loads or changed_gens or ext_grid_changed or summary_changed or layout_changed),
+            buses=[result.buses[i] for i in changed_buses],
+            lines=[IndexedLineResult(index=i, **jsonable_encoder(result.lines[i])) for i in changed_lines],
+            loads=[IndexedLoadResult(index=i, **jsonable_encoder(result.loads[i])) for i in changed_loads],
+            generators=[IndexedGeneratorResult(index=i, **jsonable_encoder(result.generators[i])) for i in changed_gens],
+            ext_grid=result.ext_grid if ext_grid_changed else None,
+            layout=result.layout if layout_changed else None,
+            **summary
+        )
+        return delta, merged
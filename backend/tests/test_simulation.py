@@ -1,10 +1,19 @@
 import os
+import time
 import pytest
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from fastapi.testclient import TestClient
 from app.main import app
 from app.models.power_system_results import PowerSystemResult
 import pandapower as pp
 from pandapower.converter.matpower import from_mpc
+from app.services.algorithm_selector import AlgorithmSelector
+from app.services.matpower_service import MatpowerService
+from app.services.probabilistic_service import _solve_batch
+from app.services.profiling_service import ProfilingService
+from app.services.result_delta_service import ResultDeltaService
+from app.services.layout_service import LayoutService
 
 client = TestClient(app)
 
@@ -51,3 +60,283 @@ def test_upload_matpower():
     # Adicionar verificação de tensão
     buses = data["buses"]
     assert all(0.9 <= bus["vm_pu"] <= 1.1 for bus in buses)  # Tensões dentro dos limites
+
+
+def test_probabilistic_matpower():
+    # Fluxo de potência probabilístico com poucas amostras, dividido em dois processos
+    payload = {
+        "samples": 20,
+        "load": {"distribution": "normal", "mean": 1.0, "std": 0.05},
+        "batch_size": 10,
+        "workers": 2,
+        "seed": 42
+    }
+    response = client.post("/sisep/matpower/case9p.m/probabilistic", json=payload)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["samples"] == 20
+    assert data["converged_samples"] > 0
+    assert data["batches"] == 2
+    assert len(data["buses"]) == 9
+
+    # Percentis ordenados e dentro dos limites de tensão
+    for bus in data["buses"]:
+        pct = bus["vm_percentiles_pu"]
+        assert pct["p5"] <= pct["p50"] <= pct["p95"]
+        assert 0.9 <= pct["p50"] <= 1.1
+
+    assert all(0.0 <= line["exceedance_probability"] <= 1.0 for line in data["lines"])
+    assert data["losses"]["min_mw"] <= data["losses"]["mean_mw"] <= data["losses"]["max_mw"]
+
+
+def test_probabilistic_bfsw_meshed():
+    # Varredura direta/inversa em rede malhada é rejeitada antes do Monte Carlo
+    payload = {"samples": 4, "algorithm": "bfsw", "seed": 1}
+    response = client.post("/sisep/matpower/case4p.m/probabilistic", json=payload)
+
+    assert response.status_code == 400
+    assert "radial" in response.json()["detail"]
+
+    # Falhas do solver dentro do lote contam como amostras não convergidas
+    net = MatpowerService().load_net_from_filename("case4p.m")
+    result = _solve_batch(net, np.ones((2, len(net.load))), np.ones((2, len(net.gen))), "bfsw")
+    assert not result["converged"].any()
+    assert np.isnan(result["vm"]).all()
+
+
+def test_auto_algorithm_matpower():
+    # Seleção automática do algoritmo com relatório das tentativas
+    response = client.get("/sisep/matpower/case9p.m", params={"algorithm": "auto"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["algorithm"] in AlgorithmSelector.ITERATION_BUDGET
+    assert len(data["attempts"]) >= 1
+    # A última tentativa é a que convergiu e corresponde ao algoritmo reportado
+    assert data["attempts"][-1]["converged"]
+    assert data["attempts"][-1]["algorithm"] == data["algorithm"]
+
+def test_auto_algorithm_history_ranking():
+    # O histórico troca de lugar os algoritmos medidos e adia os que falharam;
+    # o não testado (fdbx) mantém a posição heurística
+    selector = AlgorithmSelector()
+    selector.record("case", "nr", 0.5, converged=True)
+    selector.record("case", "fdxb", 0.1, converged=True)
+    selector.record("case", "gs", 0.0, converged=False)
+
+    assert selector.rank_chain("case", ["gs", "nr", "fdbx", "fdxb"]) == ["fdxb", "fdbx", "nr", "gs"]
+
+    # Um algoritmo rápido que quase sempre falha fica atrás dos não testados
+    for _ in range(10):
+        selector.record("case", "fdxb", 0.1, converged=False)
+    assert selector.rank_chain("case", ["gs", "nr", "fdbx", "fdxb"]) == ["nr", "fdbx", "fdxb", "gs"]
+
+
+def test_auto_algorithm_keeps_heuristic_prior():
+    # Uma execução explícita com nr numa rede radial não tira o bfsw da frente
+    net = pp.create_empty_network()
+    buses = [pp.create_bus(net, vn_kv=13.8) for _ in range(4)]
+    pp.create_ext_grid(net, buses[0], max_p_mw=10.0, min_p_mw=0.0, max_q_mvar=10.0, min_q_mvar=-10.0)
+    for f, t in zip(buses[:-1], buses[1:]):
+        pp.create_line_from_parameters(net, f, t, length_km=1.0, r_ohm_per_km=0.2, x_ohm_per_km=0.4, c_nf_per_km=0.0, max_i_ka=1.0)
+    pp.create_load(net, buses[-1], p_mw=1.0, q_mvar=0.3)
+
+    service = MatpowerService()
+    service._run_simulation(net, 'nr')
+
+    selector = service.algorithm_selector
+    chain = selector.candidate_chain(selector.network_features(net))
+    assert chain[0] == 'bfsw'
+    assert selector.rank_chain(selector.case_key(net), chain)[0] == 'bfsw'
+
+    result = service._run_simulation(net, 'auto')
+    assert result.attempts[0].algorithm == 'bfsw'
+
+
+def test_algorithm_history_bounded(monkeypatch):
+    # O histórico mantém apenas os casos usados mais recentemente
+    monkeypatch.setattr(AlgorithmSelector, "MAX_ENTRIES", 2)
+    selector = AlgorithmSelector()
+    selector.record("a", "nr", 0.1, converged=True)
+    selector.record("b", "nr", 0.1, converged=True)
+    selector.rank_chain("a", ["nr"])
+    selector.record("c", "nr", 0.1, converged=True)
+
+    assert list(selector._history) == ["a", "c"]
+
+
+def test_profile_disabled_by_default(monkeypatch):
+    # Sem habilitar por configuração, a requisição com perfil é recusada
+    monkeypatch.setattr(ProfilingService, "PROFILING_ENABLED", False)
+    response = client.get("/sisep/matpower/case3p.m", params={"profile": "true"})
+    assert response.status_code == 403
+
+def test_profile_matpower(monkeypatch, tmp_path):
+    # Perfil por requisição: resumo na resposta e artefatos gravados
+    monkeypatch.setattr(ProfilingService, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(ProfilingService, "PROFILE_DIR", str(tmp_path))
+
+    response = client.get("/sisep/matpower/case3p.m", headers={"X-SISEP-Profile": "true"})
+    assert response.status_code == 200
+    profile = response.json()["profile"]
+    assert {"parse", "solve", "conversion"} <= set(profile["phases"])
+
+    response = client.get(f"/sisep/profiles/{profile['profile_id']}")
+    assert response.status_code == 200
+    speedscope = response.json()
+    assert speedscope["profiles"][0]["type"] == "sampled"
+
+    response = client.get(f"/sisep/profiles/{profile['profile_id']}", params={"format": "collapsed"})
+    assert response.status_code == 200
+
+def test_profile_retention(monkeypatch, tmp_path):
+    # Apenas os perfis mais recentes permanecem em disco
+    monkeypatch.setattr(ProfilingService, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(ProfilingService, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(ProfilingService, "MAX_PROFILES", 1)
+
+    for _ in range(3):
+        response = client.get("/sisep/matpower/case3p.m", params={"profile": "true"})
+        assert response.status_code == 200
+    latest = response.json()["profile"]["profile_id"]
+
+    assert sorted(os.listdir(tmp_path)) == [f"{latest}.collapsed.txt", f"{latest}.speedscope.json"]
+
+
+def test_etag_not_modified():
+    # Re-simulação sem alterações retorna 304 com o mesmo ETag
+    response = client.get("/sisep/matpower/case3p.m")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = client.get("/sisep/matpower/case3p.m", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+def test_delta_identity_fields_exact():
+    # Religar um ramo é sempre uma alteração, mesmo com tolerância alta
+    response = client.get("/sisep/matpower/case3p.m")
+    base = PowerSystemResult(**response.json())
+    rewired = PowerSystemResult(**response.json())
+    rewired.lines[0].to_bus = (rewired.lines[0].to_bus + 1) % len(rewired.buses)
+
+    delta, _ = ResultDeltaService().diff(base, rewired, ResultDeltaService.MAX_TOLERANCE)
+    assert delta.changed
+    assert [line.index for line in delta.lines] == [0]
+
+def test_delta_upload_matpower():
+    # Após editar uma carga, apenas os elementos alterados são retornados
+    file_path = os.path.join(os.path.dirname(__file__), "../data/case3p.m")
+    with open(file_path, "r") as f:
+        content = f.read()
+
+    response = client.post(
+        "/sisep/simulate/matpower/upload",
+        files={"file": ("case3p.m", content.encode(), "text/plain")}
+    )
+    assert response.status_code == 200
+    base = response.json()
+    etag = response.headers["ETag"]
+
+    # Aumentar a carga ativa da barra 3 de 40 MW para 60 MW
+    edited = content.replace("3 1 40 30", "3 1 60 30")
+    assert edited != content
+    response = client.post(
+        "/sisep/simulate/matpower/upload",
+        params={"delta": "true", "tolerance": 1e-4},
+        files={"file": ("case3p.m", edited.encode(), "text/plain")},
+        headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["X-SISEP-Delta"] == "true"
+    data = response.json()
+    assert data["base_etag"] == etag.strip('"')
+    assert data["changed"]
+    assert data["etag"] == response.headers["ETag"].strip('"')
+    assert 0 < len(data["buses"]) <= len(base["buses"])
+    assert data["loadSystemP"] > base["loadSystemP"]
+
+
+def test_layout_matpower():
+    # Layout calculado no servidor e reaproveitado pelo hash da topologia
+    response = client.get("/sisep/matpower/case14p.m/layout")
+    assert response.status_code == 200
+    layout = response.json()
+    assert layout["method"] == "force"
+    assert len(layout["buses"]) == 14
+    assert all(0.0 <= bus["x"] <= 1.0 and 0.0 <= bus["y"] <= 1.0 for bus in layout["buses"])
+
+    # Mesmo layout retornado junto com o resultado da simulação
+    response = client.get("/sisep/matpower/case14p.m", params={"include_layout": "true"})
+    assert response.status_code == 200
+    assert response.json()["layout"] == layout
+
+    response = client.get("/sisep/matpower/case14p.m/layout", params={"method": "hierarchical"})
+    assert response.status_code == 200
+    hierarchical = response.json()
+    assert hierarchical["topology_hash"] == layout["topology_hash"]
+    # A barra slack fica na primeira camada
+    assert min(bus["y"] for bus in hierarchical["buses"]) == hierarchical["buses"][0]["y"]
+
+
+def test_layout_with_if_none_match():
+    # Pedir o layout com o ETag de um resultado sem layout retorna o resultado completo
+    response = client.get("/sisep/matpower/case14p.m")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    for params in ({"include_layout": "true"}, {"include_layout": "true", "delta": "true"}):
+        response = client.get("/sisep/matpower/case14p.m", params=params, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert "X-SISEP-Delta" not in response.headers
+        assert len(response.json()["layout"]["buses"]) == 14
+        assert response.headers["ETag"] != etag
+
+    # Trocar apenas o método de layout envia o novo layout na resposta incremental
+    with_layout = response.headers["ETag"]
+    response = client.get(
+        "/sisep/matpower/case14p.m",
+        params={"include_layout": "true", "layout_method": "hierarchical", "delta": "true"},
+        headers={"If-None-Match": with_layout}
+    )
+    assert response.status_code == 200
+    assert response.headers["X-SISEP-Delta"] == "true"
+    assert response.json()["layout"]["method"] == "hierarchical"
+
+
+def test_layout_large_network_time():
+    # Repulsão em grade: layout por forças de uma rede com 2000 barras em poucos segundos
+    rng = np.random.default_rng(1)
+    n = 2000
+    from_buses = np.concatenate((np.arange(1, n), rng.integers(0, n, size=n // 5)))
+    to_buses = np.concatenate(([rng.integers(0, i) for i in range(1, n)], rng.integers(0, n, size=n // 5)))
+
+    start_time = time.time()
+    layout = LayoutService().compute(np.arange(n), from_buses, to_buses, root=0)
+    assert time.time() - start_time < 5.0
+
+    xy = np.array([(bus.x, bus.y) for bus in layout.buses])
+    assert len(xy) == n
+    assert ((xy >= 0.0) & (xy <= 1.0)).all()
+    assert len(np.unique(xy.round(6), axis=0)) == n
+
+
+def test_layout_concurrent_requests(monkeypatch):
+    # Requisições simultâneas da mesma topologia calculam o layout uma única vez
+    service = LayoutService()
+    build = service._build
+    calls = []
+
+    def slow_build(*args):
+        calls.append(args)
+        time.sleep(0.2)
+        return build(*args)
+
+    monkeypatch.setattr(service, "_build", slow_build)
+    buses, from_buses, to_buses = np.arange(4), np.array([0, 1, 2]), np.array([1, 2, 3])
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        layouts = list(executor.map(lambda _: service.compute(buses, from_buses, to_buses, 0), range(4)))
+
+    assert len(calls) == 1
+    assert all(layout is layouts[0] for layout in layouts)
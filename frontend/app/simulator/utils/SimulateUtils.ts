@@ -180,6 +180,40 @@ export function applyBaseMVAToLines(mpc: MPC): MPC {
   return updatedMPC;
 }
 
+// Último resultado recebido do backend e seu ETag, usados nas re-simulações incrementais
+let lastRawResult: any = null;
+let lastEtag: string | null = null;
+
+/**
+ * Aplica uma resposta incremental (delta) do backend sobre o resultado anterior
+ */
+function applyResultDelta(base: any, delta: any): any {
+  const changedBuses = new Map<number, any>((delta.buses || []).map((b: any) => [b.bus_id, b]));
+  const mergeIndexed = (items: any[] = [], changed: any[] = []) => {
+    const merged = [...items];
+    changed.forEach(({ index, ...item }: any) => { merged[index] = item; });
+    return merged;
+  };
+  
+  return {
+    ...base,
+    buses: (base.buses || []).map((b: any) => changedBuses.get(b.bus_id) ?? b),
+    lines: mergeIndexed(base.lines, delta.lines),
+    loads: mergeIndexed(base.loads, delta.loads),
+    generators: mergeIndexed(base.generators, delta.generators),
+    ext_grid: delta.ext_grid ?? base.ext_grid,
+    layout: delta.layout ?? base.layout,
+    genCapacityP: delta.genCapacityP,
+    genCapacityQmin: delta.genCapacityQmin,
+    genCapacityQmax: delta.genCapacityQmax,
+    loadSystemP: delta.loadSystemP,
+    loadSystemQ: delta.loadSystemQ,
+    iterations: delta.iterations,
+    execution_time_s: delta.execution_time_s,
+    algorithm: delta.algorithm
+  };
+}
+
 /**
  * Faz a simulação chamando o backend
  */
@@ -191,12 +225,19 @@ export async function simulateSystem(mpc: MPC, algorithm: string = 'nr'): Promis
   const formData = new FormData();
   formData.append('file', blob, 'case_custom.m');
   
-  const response = await fetch(`http://localhost:8000/sisep/simulate/matpower/upload?algorithm=${algorithm}`, {
+  // Enviar o ETag do resultado anterior para receber apenas os valores alterados
+  const headers: Record<string, string> = {};
+  if (lastEtag && lastRawResult) {
+    headers['If-None-Match'] = lastEtag;
+  }
+  
+  const response = await fetch(`http://localhost:8000/sisep/simulate/matpower/upload?algorithm=${algorithm}&delta=true`, {
     method: 'POST',
-    body: formData
+    body: formData,
+    headers
   });
   
-  if (!response.ok) {
+  if (response.status !== 304 && !response.ok) {
     const errorText = await response.text();
     console.error('Erro na resposta do servidor:', errorText);
     
@@ -228,7 +269,17 @@ export async function simulateSystem(mpc: MPC, algorithm: string = 'nr'): Promis
     }
   }
   
-  const rawResult = await response.json();
+  let rawResult: any;
+  if (response.status === 304) {
+    // Nenhum valor mudou além da tolerância: reaproveitar o resultado anterior
+    rawResult = lastRawResult;
+  } else if (response.headers.get('X-SISEP-Delta') === 'true') {
+    rawResult = applyResultDelta(lastRawResult, await response.json());
+  } else {
+    rawResult = await response.json();
+  }
+  lastRawResult = rawResult;
+  lastEtag = response.headers.get('ETag') ?? lastEtag;
   
   // Ajustar bus_id somando 1 e renomear campos do backend
   const adjustedResult: MPCResult = {